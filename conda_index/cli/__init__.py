@@ -101,6 +101,16 @@ from .. import yaml
     default=True,
     show_default=True,
 )
+@click.option(
+    "--trust-cache/--no-trust-cache",
+    help="""
+        Skip listing and stat'ing package files; regenerate repodata from the
+        packages recorded in the cache by the previous run. Packages added,
+        changed or removed since then are missed.
+        """,
+    default=False,
+    show_default=True,
+)
 @click.option("--threads", default=MAX_THREADS_DEFAULT, show_default=True)
 @click.option(
     "--verbose",
@@ -127,6 +137,7 @@ def cli(
     compact=True,
     base_url=None,
     current_repodata=True,
+    trust_cache=False,
 ):
     logutil.configure()
     if verbose:
@@ -147,6 +158,7 @@ def cli(
         compact_json=compact,
         base_url=base_url,
         write_current_repodata=current_repodata,
+        trust_cache=trust_cache,
     )
 
     current_index_versions = None
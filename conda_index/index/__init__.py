@@ -3,7 +3,6 @@
 from __future__ import annotations
 
 import bz2
-import copy
 import functools
 import json
 import logging
@@ -11,6 +10,7 @@ import multiprocessing
 import os
 import sys
 import time
+from collections import defaultdict
 from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timezone
 from os.path import basename, getmtime, getsize, isfile, join
@@ -111,6 +111,7 @@ def update_index(
     write_bz2=True,
     write_zst=False,
     write_run_exports=False,
+    trust_cache=False,
 ):
     """
     High-level interface to ``ChannelIndex``. Index all subdirs under
@@ -146,6 +147,7 @@ def update_index(
         write_bz2=write_bz2,
         write_zst=write_zst,
         write_run_exports=write_run_exports,
+        trust_cache=trust_cache,
     )
 
     channel_index.index(
@@ -211,9 +213,11 @@ CHANNELDATA_FIELDS = (
 
 def _apply_instructions(subdir, repodata, instructions):
     repodata.setdefault("removed", [])
+    conda_packages = repodata.get("packages.conda", {})
+    instruction_packages = instructions.get("packages", {})
     utils.merge_or_update_dict(
         repodata.get("packages", {}),
-        instructions.get("packages", {}),
+        instruction_packages,
         merge=False,
         add_missing_keys=False,
     )
@@ -221,17 +225,17 @@ def _apply_instructions(subdir, repodata, instructions):
     #    that a similarly-named .tar.bz2 file is the same content as .conda, and shares fixes
     new_pkg_fixes = {
         k.replace(CONDA_PACKAGE_EXTENSION_V1, CONDA_PACKAGE_EXTENSION_V2): v
-        for k, v in instructions.get("packages", {}).items()
+        for k, v in instruction_packages.items()
     }
 
     utils.merge_or_update_dict(
-        repodata.get("packages.conda", {}),
+        conda_packages,
         new_pkg_fixes,
         merge=False,
         add_missing_keys=False,
     )
     utils.merge_or_update_dict(
-        repodata.get("packages.conda", {}),
+        conda_packages,
         instructions.get("packages.conda", {}),
         merge=False,
         add_missing_keys=False,
@@ -257,7 +261,12 @@ def _apply_instructions(subdir, repodata, instructions):
     return repodata
 
 
+@functools.lru_cache(maxsize=None)
 def _get_jinja2_environment():
+    """
+    Shared per process so each template is compiled once, not once per subdir.
+    """
+
     def _filter_strftime(dt, dt_format):
         if isinstance(dt, (int, float)):
             if dt > 253402300799:  # 9999-12-31
@@ -344,10 +353,18 @@ def _get_resolve_object(subdir, precs=None, repodata=None):
     return r
 
 
+def _expandable_groups(r):
+    """
+    Map each package name in r to a mutable set of its records. Records are
+    not modified, so they are shared instead of deep-copied.
+    """
+    return defaultdict(set, ((name, set(recs)) for name, recs in r.groups.items()))
+
+
 def _add_missing_deps(new_r, original_r):
     """For each package in new_r, if any deps are not satisfiable, backfill them from original_r."""
 
-    expanded_groups = copy.deepcopy(new_r.groups)
+    expanded_groups = _expandable_groups(new_r)
     seen_specs = set()
     for g_name, g_recs in new_r.groups.items():
         for g_rec in g_recs:
@@ -359,9 +376,7 @@ def _add_missing_deps(new_r, original_r):
                     matches = original_r.find_matches(ms)
                     if matches:
                         version = matches[0].version
-                        expanded_groups[ms.name] = set(
-                            expanded_groups.get(ms.name, [])
-                        ) | set(
+                        expanded_groups[ms.name].update(
                             original_r.find_matches(MatchSpec(f"{ms.name}={version}"))
                         )
                 seen_specs.add(dep_spec)
@@ -369,7 +384,7 @@ def _add_missing_deps(new_r, original_r):
 
 
 def _add_prev_ver_for_features(new_r, orig_r):
-    expanded_groups = copy.deepcopy(new_r.groups)
+    expanded_groups = _expandable_groups(new_r)
     for g_name in new_r.groups:
         if not any(m.track_features or m.features for m in new_r.groups[g_name]):
             # no features so skip
@@ -389,9 +404,7 @@ def _add_prev_ver_for_features(new_r, orig_r):
                     keep_m = _m
                     break
             if keep_m is not None:
-                expanded_groups[g_name] = {keep_m} | set(
-                    expanded_groups.get(g_name, [])
-                )
+                expanded_groups[g_name].add(keep_m)
 
     return [pkg for group in expanded_groups.values() for pkg in group]
 
@@ -432,7 +445,7 @@ def _build_current_repodata(subdir, repodata, pins):
     r = _get_resolve_object(subdir, repodata=repodata)
     keep_pkgs = _shard_newest_packages(subdir, r, pins)
     new_repodata = {
-        k: repodata[k] for k in set(repodata.keys()) - {"packages", "packages.conda"}
+        k: repodata[k] for k in repodata.keys() - {"packages", "packages.conda"}
     }
     packages = {}
     conda_packages = {}
@@ -481,6 +494,7 @@ class ChannelIndex:
     :param channel_url: fsspec URL where package files live. If provided, channel_root will only be used for cache and index output.
     :param fs: ``MinimalFS`` instance to be used with channel_url. Wrap fsspec AbstractFileSystem with ``conda_index.index.fs.FsspecFS(fs)``.
     :param base_url: Add ``base_url/<subdir>`` to repodata.json to be able to host packages separate from repodata.json
+    :param trust_cache: Don't list or stat package files; regenerate repodata from the packages recorded by the previous run. Only safe if the channel has not changed since then.
     """
 
     fs: MinimalFS | None = None
@@ -505,6 +519,7 @@ class ChannelIndex:
         fs: MinimalFS | None = None,
         base_url: str | None = None,
         write_current_repodata=True,
+        trust_cache=False,
     ):
         if threads is None:
             threads = MAX_THREADS_DEFAULT
@@ -532,6 +547,7 @@ class ChannelIndex:
         self.compact_json = compact_json
         self.base_url = base_url
         self.write_current_repodata = write_current_repodata
+        self.trust_cache = trust_cache
 
     def index(
         self,
@@ -695,10 +711,10 @@ class ChannelIndex:
         for subdir in subdirs:
             log.info("Channeldata subdir: %s", subdir)
             log.debug("%s read repodata", subdir)
-            with open(
-                os.path.join(self.output_root, subdir, REPODATA_JSON_FN)
-            ) as repodata:
-                patched_repodata = json.load(repodata)
+            # json.loads() accepts bytes; skip the text-mode decoding layer
+            patched_repodata = json.loads(
+                Path(self.output_root, subdir, REPODATA_JSON_FN).read_bytes()
+            )
 
             self._update_channeldata(channel_data, patched_repodata, subdir)
 
@@ -782,6 +798,10 @@ class ChannelIndex:
 
         Return name of subdir.
         """
+        if self.trust_cache and not cache.cache_is_brand_new:
+            log.debug("%s trust cache; skip listdir", subdir)
+            return subdir
+
         # exactly these packages (unless they are un-indexable) will be in the
         # output repodata
         cache.save_fs_state(subdir_path)
@@ -847,9 +867,10 @@ class ChannelIndex:
         Write repodata to :json_filename, but only if changed.
         """
         repodata_json_path = join(self.channel_root, subdir, json_filename)
-        new_repodata = self.json_dumps(repodata)
+        # encode once; the same buffer is written and fed to the compressors
+        new_repodata_bytes = self.json_dumps(repodata).encode("utf-8")
         write_result = self._maybe_write(
-            repodata_json_path, new_repodata, write_newline_end=False
+            repodata_json_path, new_repodata_bytes, write_newline_end=False
         )
         # write repodata.json.bz2 if it doesn't exist, even if repodata.json has
         # not changed
@@ -857,14 +878,14 @@ class ChannelIndex:
         repodata_zst_path = repodata_json_path + ".zst"
         if write_result or not os.path.exists(repodata_bz2_path):
             if self.write_bz2:
-                bz2_content = bz2.compress(new_repodata.encode("utf-8"))
+                bz2_content = bz2.compress(new_repodata_bytes)
                 self._maybe_write(repodata_bz2_path, bz2_content)
             else:
                 self._maybe_remove(repodata_bz2_path)
             if self.write_zst:
                 repodata_zst_content = zstandard.ZstdCompressor(
                     level=ZSTD_COMPRESS_LEVEL, threads=ZSTD_COMPRESS_THREADS
-                ).compress(new_repodata.encode("utf-8"))
+                ).compress(new_repodata_bytes)
                 self._maybe_write(repodata_zst_path, repodata_zst_content)
             else:
                 self._maybe_remove(repodata_zst_path)
@@ -885,9 +906,7 @@ class ChannelIndex:
         repodata_legacy_packages = repodata["packages"]
         repodata_conda_packages = repodata["packages.conda"]
 
-        repodata_packages = {}
-        repodata_packages.update(repodata_legacy_packages)
-        repodata_packages.update(repodata_conda_packages)
+        repodata_packages = {**repodata_legacy_packages, **repodata_conda_packages}
 
         subdir_path = join(self.channel_root, subdir)
 
@@ -938,12 +957,13 @@ class ChannelIndex:
         legacy_packages = repodata["packages"]
         conda_packages = repodata["packages.conda"]
 
-        use_these_legacy_keys = set(legacy_packages.keys()) - {
-            k[:-6] + CONDA_PACKAGE_EXTENSION_V1 for k in conda_packages.keys()
-        }
+        # prefer .conda; use .tar.bz2 only when there is no .conda counterpart
+        conda_stems = {k[:-6] for k in conda_packages}  # len(".conda")
         all_repodata_packages = conda_packages.copy()
         all_repodata_packages.update(
-            {k: legacy_packages[k] for k in use_these_legacy_keys}
+            (k, v)
+            for k, v in legacy_packages.items()
+            if k[:-8] not in conda_stems  # len(".tar.bz2")
         )
         package_data = channel_data.get("packages", {})
 
@@ -959,16 +979,18 @@ class ChannelIndex:
         # being built from scratch the speed difference is not noticable.
 
         def newest_by_name_and_version(all_repodata_packages):
+            # (name, version): (timestamp, fn, package)
             namever = {}
+            namever_get = namever.get
 
             for fn, package in all_repodata_packages.items():
                 key = (package["name"], package["version"])
                 timestamp = package.get("timestamp", 0)
-                existing = namever.get(key)
-                if not existing or existing[1].get("timestamp", 0) < timestamp:
-                    namever[key] = (fn, package)
+                existing = namever_get(key)
+                if existing is None or existing[0] < timestamp:
+                    namever[key] = (timestamp, fn, package)
 
-            return list(namever.values())
+            return [(fn, package) for _, fn, package in namever.values()]
 
         groups = newest_by_name_and_version(all_repodata_packages)
 
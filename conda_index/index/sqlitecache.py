@@ -134,6 +134,12 @@ class CondaIndexCache:
         Connection to our sqlite3 database.
         """
         conn = common.connect(str(self.db_filename))
+        # The cache can always be rebuilt from the packages. With the default
+        # rollback journal, NORMAL still syncs at each commit but skips the
+        # extra sync of the journal header. WAL is not used because it is not
+        # safe on network filesystems, where channels are often hosted.
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA temp_store = MEMORY")
         with conn:
             convert_cache.create(conn)
             convert_cache.migrate(conn)
@@ -497,8 +503,10 @@ class CondaIndexCache:
 
             FROM fs LEFT JOIN cached USING (path)
 
+            -- (size, mtime) is the change key; IS NOT compares NULL mtimes
+            -- (possible with fsspec) as values instead of ignoring them.
             WHERE fs.path LIKE :path_like AND
-                (fs.mtime != cached.mtime OR fs.size != cached.size OR cached.path IS NULL)
+                (fs.mtime IS NOT cached.mtime OR fs.size IS NOT cached.size OR cached.path IS NULL)
             """,
             {
                 "path_like": self.database_path_like,
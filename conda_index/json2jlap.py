@@ -91,25 +91,27 @@ def json2jlap_one(cache: Path, repodata: Path, trim_high=0, trim_low=0):
         current, current_digest = hash_and_load(repodata)
         previous, previous_digest = hash_and_load(previous_repodata)
 
-        jpatch = jsonpatch.make_patch(previous, current)
-
-        # inconvenient to add bytes size limit here; limit number of steps?
         if previous_digest == current_digest:
+            # touched but unchanged; don't diff two identical documents
             log.warning("Skip identical %s", repodata)
-        elif len(jpatch.patch) > PATCH_STEPS_LIMIT:
-            log.warning("Skip large %s-step patch", len(jpatch.patch))
         else:
-            patches.add(
-                json.dumps(
-                    {
-                        "to": current_digest.hex(),
-                        "from": previous_digest.hex(),
-                        "patch": jpatch.patch,
-                    },
-                    sort_keys=True,
-                    separators=(",", ":"),
+            jpatch = jsonpatch.make_patch(previous, current)
+
+            # inconvenient to add bytes size limit here; limit number of steps?
+            if len(jpatch.patch) > PATCH_STEPS_LIMIT:
+                log.warning("Skip large %s-step patch", len(jpatch.patch))
+            else:
+                patches.add(
+                    json.dumps(
+                        {
+                            "to": current_digest.hex(),
+                            "from": previous_digest.hex(),
+                            "patch": jpatch.patch,
+                        },
+                        sort_keys=True,
+                        separators=(",", ":"),
+                    )
                 )
-            )
 
         # metadata
         patches.add(
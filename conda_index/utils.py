@@ -15,8 +15,38 @@ DEFAULT_SUBDIRS = set(DEFAULT_SUBDIRS)
 # multithreaded checksums
 
 
+def _new_hash(algorithm):
+    """
+    Pass usedforsecurity=False so md5 remains available under FIPS-mode
+    OpenSSL (Python 3.9+).
+    """
+    try:
+        return hashlib.new(algorithm, usedforsecurity=False)
+    except TypeError:  # Python 3.8
+        return hashlib.new(algorithm)
+
+
+def _is_real_file(fd):
+    try:
+        fd.fileno()
+    except (AttributeError, OSError):  # io.UnsupportedOperation is an OSError
+        return False
+    return True
+
+
 def _checksum(fd, algorithm, buffersize=65536):
-    hash_impl = getattr(hashlib, algorithm)()
+    """
+    Hash fd from its current position to the end.
+
+    On Python 3.11+, real files go through hashlib.file_digest(), which uses
+    its own buffer size instead of buffersize. Other file objects are always
+    read in buffersize blocks, since file_digest() would hash all of a
+    BytesIO's getbuffer() regardless of position.
+    """
+    if hasattr(hashlib, "file_digest") and _is_real_file(fd):  # Python 3.11+
+        # readinto() one reusable buffer instead of a new bytes per block
+        return hashlib.file_digest(fd, lambda: _new_hash(algorithm)).hexdigest()
+    hash_impl = _new_hash(algorithm)
     for block in iter(lambda: fd.read(buffersize), b""):
         hash_impl.update(block)
     return hash_impl.hexdigest()
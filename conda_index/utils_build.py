@@ -3,6 +3,7 @@ conda_build utils we need, without configuring logging as an import side effect.
 """
 
 import contextlib
+import functools
 import hashlib
 import logging
 import os
@@ -26,8 +27,6 @@ log = logging.getLogger(__name__)
 #     try_acquire_locks,
 # )
 
-string_types = (str,)  # Python 3
-
 
 class LockError(Exception):
     """Raised when we failed to acquire a lock."""
@@ -155,15 +154,26 @@ def get_lock(folder, timeout=900):
     return fl
 
 
+@functools.lru_cache(maxsize=2048)
+def _norm(path, value):
+    """
+    Join relative value onto path and normalize. Pure string manipulation, so
+    it is safe to cache; the cwd-dependent abspath() step is left to callers.
+    """
+    if os.path.isabs(value):
+        return value
+    return os.path.normpath(os.path.join(path, value))
+
+
 def _equivalent(base_value, value, path):
     equivalent = value == base_value
-    if isinstance(value, string_types) and isinstance(base_value, string_types):
+    if isinstance(value, str) and isinstance(base_value, str):
+        base_value = _norm(path, base_value)
         if not os.path.isabs(base_value):
-            base_value = os.path.abspath(
-                os.path.normpath(os.path.join(path, base_value))
-            )
+            base_value = os.path.abspath(base_value)
+        value = _norm(path, value)
         if not os.path.isabs(value):
-            value = os.path.abspath(os.path.normpath(os.path.join(path, value)))
+            value = os.path.abspath(value)
         equivalent |= base_value == value
     return equivalent
 
@@ -1,3 +1,4 @@
+import copy
 import os
 import shutil
 import sys
@@ -88,13 +89,12 @@ def testing_homedir(tmpdir, request):
     return str(new_dir)
 
 
-@pytest.fixture(scope="function")
-def testing_config(testing_workdir):
+def _make_testing_config(croot):
     def boolify(v):
         return True if "v" == "true" else False
 
-    result = Config(
-        croot=testing_workdir,
+    return Config(
+        croot=croot,
         anaconda_upload=False,
         verbose=True,
         activate=False,
@@ -113,15 +113,29 @@ def testing_config(testing_workdir):
         exit_on_verify_error=exit_on_verify_error_default,
         conda_pkg_format=conda_pkg_format_default,
     )
+
+
+@pytest.fixture(scope="function")
+def testing_config(testing_workdir):
+    result = _make_testing_config(testing_workdir)
     assert result._src_cache_root is None
     assert result.src_cache_root == testing_workdir
     return result
 
 
-@pytest.fixture(scope="function")
-def testing_metadata(request, testing_config):
+@pytest.fixture(scope="session")
+def _testing_default_variant(tmp_path_factory):
+    """
+    get_default_variant() parses conda-build's variant configuration; do it
+    once per session instead of once per test.
+    """
+    config = _make_testing_config(str(tmp_path_factory.mktemp("variant")))
+    return get_default_variant(config)
+
+
+@pytest.fixture(scope="session")
+def _testing_metadata_template():
     d = defaultdict(dict)
-    d["package"]["name"] = request.function.__name__
     d["package"]["version"] = "1.0"
     d["build"]["number"] = "1"
     d["build"]["entry_points"] = []
@@ -133,7 +147,16 @@ def testing_metadata(request, testing_config):
     d["about"]["summary"] = "a test package"
     d["about"]["tags"] = ["a", "b"]
     d["about"]["identifiers"] = "a"
-    testing_config.variant = get_default_variant(testing_config)
+    return d
+
+
+@pytest.fixture(scope="function")
+def testing_metadata(
+    request, testing_config, _testing_default_variant, _testing_metadata_template
+):
+    d = copy.deepcopy(_testing_metadata_template)
+    d["package"]["name"] = request.function.__name__
+    testing_config.variant = copy.deepcopy(_testing_default_variant)
     testing_config.variants = [testing_config.variant]
     return MetaData.fromdict(d, config=testing_config)
 
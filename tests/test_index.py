@@ -1,11 +1,12 @@
 import bz2
 import json
+import mmap
 import os
 import shutil
 import tarfile
 import urllib.parse
 from logging import getLogger
-from os.path import dirname, isdir, isfile, join
+from os.path import dirname, isfile, join
 from pathlib import Path
 from shutil import rmtree
 
@@ -16,6 +17,7 @@ from conda.base.context import context
 
 import conda_index.api
 import conda_index.index
+from conda_index.utils import file_contents_match
 from conda_index.utils_build import copy_into
 
 from .utils import archive_dir
@@ -29,271 +31,297 @@ here = os.path.dirname(__file__)
 # match ./index_hotfix_pkgs/<subdir>
 TEST_SUBDIR = "osx-64"
 
+# reused by sequential compare_zst() calls
+ZSTD_DECOMPRESSOR = zstandard.ZstdDecompressor()
+
+EXPECTED_REPODATA_OSX64 = {
+    "info": {
+        "subdir": "osx-64",
+    },
+    "packages": {
+        "conda-index-pkg-a-1.0-py27h5e241af_0.tar.bz2": {
+            "build": "py27h5e241af_0",
+            "build_number": 0,
+            "depends": ["python >=2.7,<2.8.0a0"],
+            "license": "BSD",
+            "md5": "37861df8111170f5eed4bff27868df59",
+            "name": "conda-index-pkg-a",
+            "sha256": "459f3e9b2178fa33bdc4e6267326405329d1c1ab982273d9a1c0a5084a1ddc30",
+            "size": 8733,
+            "subdir": "osx-64",
+            "timestamp": 1508520039632,
+            "version": "1.0",
+        },
+    },
+    "packages.conda": {},
+    "removed": [],
+    "repodata_version": 1,
+}
+
+EXPECTED_CHANNELDATA_OSX64 = {
+    "channeldata_version": 1,
+    "packages": {
+        "conda-index-pkg-a": {
+            "description": "Description field for conda-index-pkg-a. Actually, this is just the python description. "
+            "Python is a widely used high-level, general-purpose, interpreted, dynamic "
+            "programming language. Its design philosophy emphasizes code "
+            "readability, and its syntax allows programmers to express concepts in "
+            "fewer lines of code than would be possible in languages such as C++ or "
+            "Java. The language provides constructs intended to enable clear programs "
+            "on both a small and large scale.",
+            "dev_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a/meta.yaml",
+            "doc_source_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a/README.md",
+            "doc_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a",
+            "home": "https://anaconda.org/conda-test/conda-index-pkg-a",
+            "license": "BSD",
+            "source_git_url": "https://github.com/kalefranz/conda-test-packages.git",
+            "subdirs": [
+                "osx-64",
+            ],
+            "summary": "Summary field for conda-index-pkg-a",
+            "version": "1.0",
+            "activate.d": False,
+            "deactivate.d": False,
+            "post_link": True,
+            "pre_link": False,
+            "pre_unlink": False,
+            "binary_prefix": False,
+            "text_prefix": True,
+            "run_exports": {},
+            # "icon_hash": None,
+            # "icon_url": None,
+            # "identifiers": None,
+            # "keywords": None,
+            # "recipe_origin": None,
+            # "source_url": None,
+            # "tags": None,
+            "timestamp": 1508520039,
+        }
+    },
+    "subdirs": ["noarch", "osx-64"],
+}
+
+EXPECTED_REPODATA_NOARCH = {
+    "info": {
+        "subdir": "noarch",
+    },
+    "packages": {
+        "conda-index-pkg-a-1.0-pyhed9eced_1.tar.bz2": {
+            "build": "pyhed9eced_1",
+            "build_number": 1,
+            "depends": ["python"],
+            "license": "BSD",
+            "md5": "56b5f6b7fb5583bccfc4489e7c657484",
+            "name": "conda-index-pkg-a",
+            "noarch": "python",
+            "sha256": "7430743bffd4ac63aa063ae8518e668eac269c783374b589d8078bee5ed4cbc6",
+            "size": 7882,
+            "subdir": "noarch",
+            "timestamp": 1508520204768,
+            "version": "1.0",
+        },
+    },
+    "packages.conda": {},
+    "removed": [],
+    "repodata_version": 1,
+}
+
+EXPECTED_CHANNELDATA_NOARCH_OSX64 = {
+    "channeldata_version": 1,
+    "packages": {
+        "conda-index-pkg-a": {
+            "description": "Description field for conda-index-pkg-a. Actually, this is just the python description. "
+            "Python is a widely used high-level, general-purpose, interpreted, dynamic "
+            "programming language. Its design philosophy emphasizes code "
+            "readability, and its syntax allows programmers to express concepts in "
+            "fewer lines of code than would be possible in languages such as C++ or "
+            "Java. The language provides constructs intended to enable clear programs "
+            "on both a small and large scale.",
+            "dev_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a/meta.yaml",
+            "doc_source_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a/README.md",
+            "doc_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a",
+            "home": "https://anaconda.org/conda-test/conda-index-pkg-a",
+            "license": "BSD",
+            "source_git_url": "https://github.com/kalefranz/conda-test-packages.git",
+            # "source_url": None,
+            "subdirs": [
+                "noarch",
+                "osx-64",
+            ],
+            "summary": "Summary field for conda-index-pkg-a. This is the python noarch version.",  # <- tests that the higher noarch build number is the data collected
+            "version": "1.0",
+            "activate.d": False,
+            "deactivate.d": False,
+            "post_link": True,
+            "pre_link": False,
+            "pre_unlink": False,
+            "binary_prefix": False,
+            "text_prefix": True,
+            "run_exports": {},
+            # "icon_hash": None,
+            # "icon_url": None,
+            # "identifiers": None,
+            # "tags": None,
+            "timestamp": 1508520039,
+            # "keywords": None,
+            # "recipe_origin": None,
+        }
+    },
+    "subdirs": [
+        "noarch",
+        "osx-64",
+    ],
+}
+
 
 def download(url, local_path):
     # NOTE: The tests in this module used to download packages from the
     # conda-test channel. These packages are small and are now included.
-    if not isdir(dirname(local_path)):
-        os.makedirs(dirname(local_path))
+    os.makedirs(dirname(local_path), exist_ok=True)
 
     archive_path = join(here, "archives", url.rsplit("/", 1)[-1])
 
-    shutil.copy(archive_path, local_path)
+    # copyfile() uses the platform's in-kernel fast copy (sendfile,
+    # fcopyfile) and skips copying permission bits.
+    shutil.copyfile(archive_path, local_path)
     return local_path
 
 
-def test_index_on_single_subdir_1(testing_workdir):
+def assert_decompresses_to(original_path, decompressed, buffersize=1 << 16):
+    """
+    Assert that reading decompressed yields exactly the bytes of original_path.
+    Compares chunk by chunk against an mmap of the original.
+    """
+    with open(original_path, "rb") as fp, mmap.mmap(
+        fp.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mapped:
+        offset = 0
+        for chunk in iter(lambda: decompressed.read(buffersize), b""):
+            # slicing an mmap returns bytes, so a failing assert holds no
+            # buffer export that would stop the mmap from closing
+            assert mapped[offset : offset + len(chunk)] == chunk
+            offset += len(chunk)
+        assert offset == len(mapped)
+
+
+def compare_zst(subdir_path: Path, filename):
+    with (subdir_path / (filename + ".zst")).open("rb") as raw:
+        with ZSTD_DECOMPRESSOR.stream_reader(raw) as decompressed:
+            assert_decompresses_to(subdir_path / filename, decompressed)
+
+
+def compare_bz2(subdir_path: Path, filename):
+    with bz2.open(subdir_path / (filename + ".bz2"), "rb") as decompressed:
+        assert_decompresses_to(subdir_path / filename, decompressed)
+
+
+def load_json(path):
+    return json.loads(Path(path).read_bytes())
+
+
+def load_json_pair(path_a, path_b):
+    """
+    Load two JSON files, parsing only once if they are byte-identical (as
+    repodata.json and repodata_from_packages.json are without patches).
+    """
+    data = load_json(path_a)
+    if file_contents_match(path_a, path_b):
+        return data, data
+    return data, load_json(path_b)
+
+
+@pytest.fixture(scope="module")
+def single_subdir_index(tmp_path_factory):
+    """
+    Channel with one osx-64 package, indexed once per module with bz2 and zst
+    output. Tests must not modify it.
+    """
+    channel_root = str(tmp_path_factory.mktemp("single_subdir_index"))
     test_package_path = join(
-        testing_workdir, "osx-64", "conda-index-pkg-a-1.0-py27h5e241af_0.tar.bz2"
+        channel_root, "osx-64", "conda-index-pkg-a-1.0-py27h5e241af_0.tar.bz2"
     )
     test_package_url = "https://conda.anaconda.org/conda-test/osx-64/conda-index-pkg-a-1.0-py27h5e241af_0.tar.bz2"
     download(test_package_url, test_package_path)
 
     conda_index.index.update_index(
-        testing_workdir, channel_name="test-channel", write_bz2=True, write_zst=True
+        channel_root, channel_name="test-channel", write_bz2=True, write_zst=True
     )
+    return channel_root
+
+
+def test_index_on_single_subdir_1(single_subdir_index):
+    # single_subdir_index is read-only; shared with other tests
 
     # #######################################
     # tests for osx-64 subdir
     # #######################################
-    assert isfile(join(testing_workdir, "osx-64", "index.html"))
-    assert isfile(join(testing_workdir, "osx-64", "repodata.json.bz2"))
-    assert isfile(join(testing_workdir, "osx-64", "repodata_from_packages.json.bz2"))
+    assert isfile(join(single_subdir_index, "osx-64", "index.html"))
+    assert isfile(join(single_subdir_index, "osx-64", "repodata.json.bz2"))
+    assert isfile(
+        join(single_subdir_index, "osx-64", "repodata_from_packages.json.bz2")
+    )
 
-    assert isfile(join(testing_workdir, "osx-64", "repodata.json.zst"))
-    assert isfile(join(testing_workdir, "osx-64", "repodata_from_packages.json.zst"))
+    assert isfile(join(single_subdir_index, "osx-64", "repodata.json.zst"))
+    assert isfile(
+        join(single_subdir_index, "osx-64", "repodata_from_packages.json.zst")
+    )
 
     # compressed version must be byte-identical
-    def compare_zst(filename):
-        original_path = Path(testing_workdir, "osx-64", filename)
-        compressed_path = Path(testing_workdir, "osx-64", filename + ".zst")
-        assert original_path.read_bytes() == zstandard.decompress(
-            compressed_path.read_bytes()
-        )
-
-    compare_zst("repodata.json")
-    compare_zst("current_repodata.json")
-    compare_zst("repodata_from_packages.json")
+    subdir_path = Path(single_subdir_index, "osx-64")
+    compare_zst(subdir_path, "repodata.json")
+    compare_zst(subdir_path, "current_repodata.json")
+    compare_zst(subdir_path, "repodata_from_packages.json")
 
     # we should stop doing bz2 (conda dropped support in 2016) but it should
     # work properly.
-    def compare_bz2(filename):
-        original_path = Path(testing_workdir, "osx-64", filename)
-        compressed_path = Path(testing_workdir, "osx-64", filename + ".bz2")
-        assert original_path.read_bytes() == bz2.decompress(
-            compressed_path.read_bytes()
-        )
+    compare_bz2(subdir_path, "repodata.json")
+    compare_bz2(subdir_path, "current_repodata.json")
+    compare_bz2(subdir_path, "repodata_from_packages.json")
 
-    compare_bz2("repodata.json")
-    compare_bz2("current_repodata.json")
-    compare_bz2("repodata_from_packages.json")
-
-    with open(join(testing_workdir, "osx-64", "repodata.json")) as fh:
-        actual_repodata_json = json.loads(fh.read())
-    with open(join(testing_workdir, "osx-64", "repodata_from_packages.json")) as fh:
-        actual_pkg_repodata_json = json.loads(fh.read())
-    expected_repodata_json = {
-        "info": {
-            "subdir": "osx-64",
-        },
-        "packages": {
-            "conda-index-pkg-a-1.0-py27h5e241af_0.tar.bz2": {
-                "build": "py27h5e241af_0",
-                "build_number": 0,
-                "depends": ["python >=2.7,<2.8.0a0"],
-                "license": "BSD",
-                "md5": "37861df8111170f5eed4bff27868df59",
-                "name": "conda-index-pkg-a",
-                "sha256": "459f3e9b2178fa33bdc4e6267326405329d1c1ab982273d9a1c0a5084a1ddc30",
-                "size": 8733,
-                "subdir": "osx-64",
-                "timestamp": 1508520039632,
-                "version": "1.0",
-            },
-        },
-        "packages.conda": {},
-        "removed": [],
-        "repodata_version": 1,
-    }
-    assert actual_repodata_json == expected_repodata_json
-    assert actual_pkg_repodata_json == expected_repodata_json
+    actual_repodata_json, actual_pkg_repodata_json = load_json_pair(
+        join(single_subdir_index, "osx-64", "repodata.json"),
+        join(single_subdir_index, "osx-64", "repodata_from_packages.json"),
+    )
+    assert actual_repodata_json == EXPECTED_REPODATA_OSX64
+    assert actual_pkg_repodata_json == EXPECTED_REPODATA_OSX64
 
     # #######################################
     # tests for full channel
     # #######################################
 
-    with open(join(testing_workdir, "channeldata.json")) as fh:
-        actual_channeldata_json = json.loads(fh.read())
-    expected_channeldata_json = {
-        "channeldata_version": 1,
-        "packages": {
-            "conda-index-pkg-a": {
-                "description": "Description field for conda-index-pkg-a. Actually, this is just the python description. "
-                "Python is a widely used high-level, general-purpose, interpreted, dynamic "
-                "programming language. Its design philosophy emphasizes code "
-                "readability, and its syntax allows programmers to express concepts in "
-                "fewer lines of code than would be possible in languages such as C++ or "
-                "Java. The language provides constructs intended to enable clear programs "
-                "on both a small and large scale.",
-                "dev_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a/meta.yaml",
-                "doc_source_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a/README.md",
-                "doc_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a",
-                "home": "https://anaconda.org/conda-test/conda-index-pkg-a",
-                "license": "BSD",
-                "source_git_url": "https://github.com/kalefranz/conda-test-packages.git",
-                "subdirs": [
-                    "osx-64",
-                ],
-                "summary": "Summary field for conda-index-pkg-a",
-                "version": "1.0",
-                "activate.d": False,
-                "deactivate.d": False,
-                "post_link": True,
-                "pre_link": False,
-                "pre_unlink": False,
-                "binary_prefix": False,
-                "text_prefix": True,
-                "run_exports": {},
-                # "icon_hash": None,
-                # "icon_url": None,
-                # "identifiers": None,
-                # "keywords": None,
-                # "recipe_origin": None,
-                # "source_url": None,
-                # "tags": None,
-                "timestamp": 1508520039,
-            }
-        },
-        "subdirs": ["noarch", "osx-64"],
-    }
-    assert actual_channeldata_json == expected_channeldata_json
-
+    actual_channeldata_json = load_json(join(single_subdir_index, "channeldata.json"))
+    assert actual_channeldata_json == EXPECTED_CHANNELDATA_OSX64
 
-def test_file_index_on_single_subdir_1(testing_workdir):
-    test_package_path = join(
-        testing_workdir, "osx-64", "conda-index-pkg-a-1.0-py27h5e241af_0.tar.bz2"
-    )
-    test_package_url = "https://conda.anaconda.org/conda-test/osx-64/conda-index-pkg-a-1.0-py27h5e241af_0.tar.bz2"
-    download(test_package_url, test_package_path)
 
-    conda_index.index.update_index(testing_workdir, channel_name="test-channel")
+def test_file_index_on_single_subdir_1(single_subdir_index):
+    # single_subdir_index is read-only; shared with other tests
 
     # #######################################
     # tests for osx-64 subdir
     # #######################################
-    assert isfile(join(testing_workdir, "osx-64", "index.html"))
-    assert isfile(join(testing_workdir, "osx-64", "repodata.json.bz2"))
-    assert isfile(join(testing_workdir, "osx-64", "repodata_from_packages.json.bz2"))
-
-    with open(join(testing_workdir, "osx-64", "repodata.json")) as fh:
-        actual_repodata_json = json.loads(fh.read())
-        assert actual_repodata_json
-    with open(join(testing_workdir, "osx-64", "repodata_from_packages.json")) as fh:
-        actual_pkg_repodata_json = json.loads(fh.read())
-    expected_repodata_json = {
-        "info": {
-            "subdir": "osx-64",
-        },
-        "packages": {
-            "conda-index-pkg-a-1.0-py27h5e241af_0.tar.bz2": {
-                "build": "py27h5e241af_0",
-                "build_number": 0,
-                "depends": ["python >=2.7,<2.8.0a0"],
-                "license": "BSD",
-                "md5": "37861df8111170f5eed4bff27868df59",
-                "name": "conda-index-pkg-a",
-                "sha256": "459f3e9b2178fa33bdc4e6267326405329d1c1ab982273d9a1c0a5084a1ddc30",
-                "size": 8733,
-                "subdir": "osx-64",
-                "timestamp": 1508520039632,
-                "version": "1.0",
-            },
-        },
-        "packages.conda": {},
-        "removed": [],
-        "repodata_version": 1,
-    }
-    assert actual_repodata_json == expected_repodata_json
-    assert actual_pkg_repodata_json == expected_repodata_json
-
-    # download two packages here, put them both in the same subdir
-    test_package_path = join(testing_workdir, "osx-64", "fly-2.5.2-0.tar.bz2")
-    test_package_url = (
-        "https://conda.anaconda.org/conda-test/osx-64/fly-2.5.2-0.tar.bz2"
+    assert isfile(join(single_subdir_index, "osx-64", "index.html"))
+    assert isfile(join(single_subdir_index, "osx-64", "repodata.json.bz2"))
+    assert isfile(
+        join(single_subdir_index, "osx-64", "repodata_from_packages.json.bz2")
     )
-    download(test_package_url, test_package_path)
 
-    test_package_path = join(testing_workdir, "osx-64", "nano-2.4.1-0-tar.bz2")
-    test_package_url = (
-        "https://conda.anaconda.org/conda-test/osx-64/nano-2.4.1-0.tar.bz2"
+    actual_repodata_json, actual_pkg_repodata_json = load_json_pair(
+        join(single_subdir_index, "osx-64", "repodata.json"),
+        join(single_subdir_index, "osx-64", "repodata_from_packages.json"),
     )
-    download(test_package_url, test_package_path)
-
-    updated_packages = expected_repodata_json.get("packages")
-
-    expected_repodata_json["packages"] = updated_packages
+    assert actual_repodata_json
+    assert actual_pkg_repodata_json
 
-    with open(join(testing_workdir, "osx-64", "repodata.json")) as fh:
-        actual_repodata_json = json.loads(fh.read())
-        assert actual_repodata_json
-    with open(join(testing_workdir, "osx-64", "repodata_from_packages.json")) as fh:
-        actual_pkg_repodata_json = json.loads(fh.read())
-        assert actual_pkg_repodata_json
-
-    assert actual_repodata_json == expected_repodata_json
-    assert actual_pkg_repodata_json == expected_repodata_json
+    assert actual_repodata_json == EXPECTED_REPODATA_OSX64
+    assert actual_pkg_repodata_json == EXPECTED_REPODATA_OSX64
 
     # #######################################
     # tests for full channel
     # #######################################
 
-    with open(join(testing_workdir, "channeldata.json")) as fh:
-        actual_channeldata_json = json.loads(fh.read())
-    expected_channeldata_json = {
-        "channeldata_version": 1,
-        "packages": {
-            "conda-index-pkg-a": {
-                "description": "Description field for conda-index-pkg-a. Actually, this is just the python description. "
-                "Python is a widely used high-level, general-purpose, interpreted, dynamic "
-                "programming language. Its design philosophy emphasizes code "
-                "readability, and its syntax allows programmers to express concepts in "
-                "fewer lines of code than would be possible in languages such as C++ or "
-                "Java. The language provides constructs intended to enable clear programs "
-                "on both a small and large scale.",
-                "dev_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a/meta.yaml",
-                "doc_source_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a/README.md",
-                "doc_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a",
-                "home": "https://anaconda.org/conda-test/conda-index-pkg-a",
-                "license": "BSD",
-                "source_git_url": "https://github.com/kalefranz/conda-test-packages.git",
-                "subdirs": [
-                    "osx-64",
-                ],
-                "summary": "Summary field for conda-index-pkg-a",
-                "version": "1.0",
-                "activate.d": False,
-                "deactivate.d": False,
-                "post_link": True,
-                "pre_link": False,
-                "pre_unlink": False,
-                "binary_prefix": False,
-                "text_prefix": True,
-                "run_exports": {},
-                # Possible keys, removed because they are None:
-                # "icon_hash": None,
-                # "icon_url": None,
-                # "identifiers": None,
-                # "keywords": None,
-                # "recipe_origin": None,
-                # "source_url": None,
-                # "tags": None,
-                "timestamp": 1508520039,
-            },
-        },
-        "subdirs": ["noarch", "osx-64"],
-    }
+    actual_channeldata_json = load_json(join(single_subdir_index, "channeldata.json"))
 
-    assert actual_channeldata_json == expected_channeldata_json
+    assert actual_channeldata_json == EXPECTED_CHANNELDATA_OSX64
 
 
 def test_index_noarch_osx64_1(testing_workdir):
@@ -329,90 +357,19 @@ def test_index_noarch_osx64_1(testing_workdir):
     assert isfile(join(testing_workdir, "noarch", "repodata.json.bz2"))
     assert isfile(join(testing_workdir, "noarch", "repodata_from_packages.json.bz2"))
 
-    with open(join(testing_workdir, "noarch", "repodata.json")) as fh:
-        actual_repodata_json = json.loads(fh.read())
-    with open(join(testing_workdir, "noarch", "repodata_from_packages.json")) as fh:
-        actual_pkg_repodata_json = json.loads(fh.read())
-    expected_repodata_json = {
-        "info": {
-            "subdir": "noarch",
-        },
-        "packages": {
-            "conda-index-pkg-a-1.0-pyhed9eced_1.tar.bz2": {
-                "build": "pyhed9eced_1",
-                "build_number": 1,
-                "depends": ["python"],
-                "license": "BSD",
-                "md5": "56b5f6b7fb5583bccfc4489e7c657484",
-                "name": "conda-index-pkg-a",
-                "noarch": "python",
-                "sha256": "7430743bffd4ac63aa063ae8518e668eac269c783374b589d8078bee5ed4cbc6",
-                "size": 7882,
-                "subdir": "noarch",
-                "timestamp": 1508520204768,
-                "version": "1.0",
-            },
-        },
-        "packages.conda": {},
-        "removed": [],
-        "repodata_version": 1,
-    }
-    assert actual_repodata_json == expected_repodata_json
-    assert actual_pkg_repodata_json == expected_repodata_json
+    actual_repodata_json, actual_pkg_repodata_json = load_json_pair(
+        join(testing_workdir, "noarch", "repodata.json"),
+        join(testing_workdir, "noarch", "repodata_from_packages.json"),
+    )
+    assert actual_repodata_json == EXPECTED_REPODATA_NOARCH
+    assert actual_pkg_repodata_json == EXPECTED_REPODATA_NOARCH
 
     # #######################################
     # tests for full channel
     # #######################################
 
-    with open(join(testing_workdir, "channeldata.json")) as fh:
-        actual_channeldata_json = json.loads(fh.read())
-    expected_channeldata_json = {
-        "channeldata_version": 1,
-        "packages": {
-            "conda-index-pkg-a": {
-                "description": "Description field for conda-index-pkg-a. Actually, this is just the python description. "
-                "Python is a widely used high-level, general-purpose, interpreted, dynamic "
-                "programming language. Its design philosophy emphasizes code "
-                "readability, and its syntax allows programmers to express concepts in "
-                "fewer lines of code than would be possible in languages such as C++ or "
-                "Java. The language provides constructs intended to enable clear programs "
-                "on both a small and large scale.",
-                "dev_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a/meta.yaml",
-                "doc_source_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a/README.md",
-                "doc_url": "https://github.com/kalefranz/conda-test-packages/blob/master/conda-index-pkg-a",
-                "home": "https://anaconda.org/conda-test/conda-index-pkg-a",
-                "license": "BSD",
-                "source_git_url": "https://github.com/kalefranz/conda-test-packages.git",
-                # "source_url": None,
-                "subdirs": [
-                    "noarch",
-                    "osx-64",
-                ],
-                "summary": "Summary field for conda-index-pkg-a. This is the python noarch version.",  # <- tests that the higher noarch build number is the data collected
-                "version": "1.0",
-                "activate.d": False,
-                "deactivate.d": False,
-                "post_link": True,
-                "pre_link": False,
-                "pre_unlink": False,
-                "binary_prefix": False,
-                "text_prefix": True,
-                "run_exports": {},
-                # "icon_hash": None,
-                # "icon_url": None,
-                # "identifiers": None,
-                # "tags": None,
-                "timestamp": 1508520039,
-                # "keywords": None,
-                # "recipe_origin": None,
-            }
-        },
-        "subdirs": [
-            "noarch",
-            "osx-64",
-        ],
-    }
-    assert actual_channeldata_json == expected_channeldata_json
+    actual_channeldata_json = load_json(join(testing_workdir, "channeldata.json"))
+    assert actual_channeldata_json == EXPECTED_CHANNELDATA_NOARCH_OSX64
 
 
 def _build_test_index(workdir):
@@ -421,20 +378,9 @@ def _build_test_index(workdir):
     """
 
     # workdir may be the same during a single test run?
-    # Python 3.7 workaround "no dirs_exist_ok flag"
-    index_hotfix_pkgs = join(here, "index_hotfix_pkgs")
-    for path in os.scandir(index_hotfix_pkgs):
-        if path.is_dir():
-            shutil.copytree(
-                join(here, "index_hotfix_pkgs", path.name), join(workdir, path.name)
-            )
-        elif path.is_file():
-            shutil.copyfile(
-                join(here, "index_hotfix_pkgs", path.name), join(workdir, path.name)
-            )
-
-    with open(os.path.join(workdir, TEST_SUBDIR, "repodata.json")) as f:
-        original_metadata = json.load(f)
+    shutil.copytree(join(here, "index_hotfix_pkgs"), workdir, dirs_exist_ok=True)
+
+    original_metadata = load_json(os.path.join(workdir, TEST_SUBDIR, "repodata.json"))
 
     pkg_list = original_metadata["packages"]
     assert "track_features_test-1.0-0.tar.bz2" in pkg_list
@@ -485,7 +431,6 @@ def test_gen_patch_py(testing_workdir):
     func = """
 def _patch_repodata(repodata, subdir):
     pkgs = repodata["packages"]
-    import fnmatch
     replacement_dict = {}
     if "track_features_test-1.0-0.tar.bz2" in pkgs:
         replacement_dict["track_features_test-1.0-0.tar.bz2"] = {"track_features": None}
@@ -493,8 +438,8 @@ def _patch_repodata(repodata, subdir):
         replacement_dict["hotfix_depends_test-1.0-dummy_0.tar.bz2"] = {
                              "depends": pkgs["hotfix_depends_test-1.0-dummy_0.tar.bz2"]["depends"] + ["dummy"],
                              "features": None}
-    revoke_list = [pkg for pkg in pkgs if fnmatch.fnmatch(pkg, "revoke_test*")]
-    remove_list = [pkg for pkg in pkgs if fnmatch.fnmatch(pkg, "remove_test*")]
+    revoke_list = [pkg for pkg in pkgs if pkg.startswith("revoke_test")]
+    remove_list = [pkg for pkg in pkgs if pkg.startswith("remove_test")]
     return {
         "patch_instructions_version": 1,
         "packages": replacement_dict,
@@ -513,8 +458,9 @@ def _patch_repodata(repodata, subdir):
             patch_generator=patch_file,
             verbose=True,
         )
-        with open(os.path.join(testing_workdir, TEST_SUBDIR, "repodata.json")) as f:
-            patched_metadata = json.load(f)
+        patched_metadata = load_json(
+            os.path.join(testing_workdir, TEST_SUBDIR, "repodata.json")
+        )
 
         pkg_list = patched_metadata["packages"]
         assert "track_features_test-1.0-0.tar.bz2" in pkg_list
@@ -541,10 +487,9 @@ def _patch_repodata(repodata, subdir):
         )
         print("pass %s remove ok" % i)
 
-        with open(
+        pkg_metadata = load_json(
             os.path.join(testing_workdir, TEST_SUBDIR, "repodata_from_packages.json")
-        ) as f:
-            pkg_metadata = json.load(f)
+        )
 
         pkg_list = pkg_metadata["packages"]
         assert "track_features_test-1.0-0.tar.bz2" in pkg_list
@@ -566,32 +511,66 @@ def _patch_repodata(repodata, subdir):
         )
 
 
-def test_channel_patch_instructions_json(testing_workdir):
-    _build_test_index(testing_workdir)
+PATCH_INSTRUCTIONS = {
+    "patch_instructions_version": 1,
+    "packages": {
+        "track_features_test-1.0-0.tar.bz2": {"track_features": None},
+        "hotfix_depends_test-1.0-dummy_0.tar.bz2": {
+            "depends": ["zlib", "dummy"],
+            "features": None,
+        },
+    },
+    "revoke": ["revoke_test-1.0-0.tar.bz2"],
+    "remove": ["remove_test-1.0-0.tar.bz2"],
+}
 
-    replacement_dict = {}
-    replacement_dict["track_features_test-1.0-0.tar.bz2"] = {"track_features": None}
-    replacement_dict["hotfix_depends_test-1.0-dummy_0.tar.bz2"] = {
-        "depends": ["zlib", "dummy"],
-        "features": None,
-    }
 
-    patch = {
-        "patch_instructions_version": 1,
-        "packages": replacement_dict,
-        "revoke": ["revoke_test-1.0-0.tar.bz2"],
-        "remove": ["remove_test-1.0-0.tar.bz2"],
-    }
+def _write_patch_instructions_json(workdir, patch):
+    """
+    Place patch_instructions.json in the subdir, to be picked up without a
+    patch_generator.
+    """
+    Path(workdir, TEST_SUBDIR, "patch_instructions.json").write_bytes(
+        json.dumps(patch).encode()
+    )
+
+
+def _write_patch_tarball(workdir, patch):
+    """
+    This is how we expect external communities to provide patches to us. We
+    can't let them just give us Python files for us to run, because of the
+    security risk of arbitrary code execution.
+    """
+    # our hotfix metadata can be generated any way you want.  Hard-code this
+    # here, but in general, people will use some python file to generate this.
+    Path("patch_instructions.json").write_bytes(json.dumps(patch).encode())
 
-    with open(
-        os.path.join(testing_workdir, TEST_SUBDIR, "patch_instructions.json"), "w"
-    ) as f:
-        json.dump(patch, f)
+    # must be .tar.bz2 or .conda; a tiny archive doesn't need bz2's 900k blocks
+    with tarfile.open("patch_archive.tar.bz2", "w:bz2", compresslevel=1) as archive:
+        archive.add(
+            "patch_instructions.json", "%s/patch_instructions.json" % TEST_SUBDIR
+        )
+    return "patch_archive.tar.bz2"
 
-    conda_index.index.update_index(testing_workdir)
 
-    with open(os.path.join(testing_workdir, TEST_SUBDIR, "repodata.json")) as f:
-        patched_metadata = json.load(f)
+@pytest.mark.parametrize(
+    "write_patch",
+    [_write_patch_instructions_json, _write_patch_tarball],
+    ids=["json", "tarball"],
+)
+def test_patch_instructions(testing_workdir, write_patch):
+    _build_test_index(testing_workdir)
+
+    patch_generator = write_patch(testing_workdir, PATCH_INSTRUCTIONS)
+
+    conda_index.index.update_index(testing_workdir, patch_generator=patch_generator)
+
+    patched_metadata = load_json(
+        os.path.join(testing_workdir, TEST_SUBDIR, "repodata.json")
+    )
+    pkg_repodata = load_json(
+        os.path.join(testing_workdir, TEST_SUBDIR, "repodata_from_packages.json")
+    )
 
     formats = (("packages", ".tar.bz2"), ("packages.conda", ".conda"))
 
@@ -613,11 +592,6 @@ def test_channel_patch_instructions_json(testing_workdir):
 
         assert "remove_test-1.0-0" + ext not in pkg_list
 
-        with open(
-            os.path.join(testing_workdir, TEST_SUBDIR, "repodata_from_packages.json")
-        ) as f:
-            pkg_repodata = json.load(f)
-
         pkg_list = pkg_repodata[key]
         assert "track_features_test-1.0-0" + ext in pkg_list
         assert pkg_list["track_features_test-1.0-0" + ext]["track_features"] == "dummy"
@@ -636,83 +610,6 @@ def test_channel_patch_instructions_json(testing_workdir):
         assert "remove_test-1.0-0" + ext in pkg_list
 
 
-def test_patch_from_tarball(testing_workdir):
-    """This is how we expect external communities to provide patches to us.
-    We can't let them just give us Python files for us to run, because of the
-    security risk of arbitrary code execution."""
-    _build_test_index(testing_workdir)
-
-    # our hotfix metadata can be generated any way you want.  Hard-code this
-    # here, but in general, people will use some python file to generate this.
-
-    replacement_dict = {}
-    replacement_dict["track_features_test-1.0-0.tar.bz2"] = {"track_features": None}
-    replacement_dict["hotfix_depends_test-1.0-dummy_0.tar.bz2"] = {
-        "depends": ["zlib", "dummy"],
-        "features": None,
-    }
-
-    patch = {
-        "patch_instructions_version": 1,
-        "packages": replacement_dict,
-        "revoke": ["revoke_test-1.0-0.tar.bz2"],
-        "remove": ["remove_test-1.0-0.tar.bz2"],
-    }
-    with open("patch_instructions.json", "w") as f:
-        json.dump(patch, f)
-
-    with tarfile.open("patch_archive.tar.bz2", "w:bz2") as archive:
-        archive.add(
-            "patch_instructions.json", "%s/patch_instructions.json" % TEST_SUBDIR
-        )
-
-    conda_index.index.update_index(
-        testing_workdir, patch_generator="patch_archive.tar.bz2"
-    )
-
-    with open(os.path.join(testing_workdir, TEST_SUBDIR, "repodata.json")) as f:
-        patched_metadata = json.load(f)
-
-    pkg_list = patched_metadata["packages"]
-    assert "track_features_test-1.0-0.tar.bz2" in pkg_list
-    assert "track_features" not in pkg_list["track_features_test-1.0-0.tar.bz2"]
-
-    assert "hotfix_depends_test-1.0-dummy_0.tar.bz2" in pkg_list
-    assert "features" not in pkg_list["hotfix_depends_test-1.0-dummy_0.tar.bz2"]
-    assert "zlib" in pkg_list["hotfix_depends_test-1.0-dummy_0.tar.bz2"]["depends"]
-    assert "dummy" in pkg_list["hotfix_depends_test-1.0-dummy_0.tar.bz2"]["depends"]
-
-    assert "revoke_test-1.0-0.tar.bz2" in pkg_list
-    assert "zlib" in pkg_list["revoke_test-1.0-0.tar.bz2"]["depends"]
-    assert (
-        "package_has_been_revoked" in pkg_list["revoke_test-1.0-0.tar.bz2"]["depends"]
-    )
-
-    assert "remove_test-1.0-0.tar.bz2" not in pkg_list
-
-    with open(
-        os.path.join(testing_workdir, TEST_SUBDIR, "repodata_from_packages.json")
-    ) as f:
-        pkg_repodata = json.load(f)
-
-    pkg_list = pkg_repodata["packages"]
-    assert "track_features_test-1.0-0.tar.bz2" in pkg_list
-    assert pkg_list["track_features_test-1.0-0.tar.bz2"]["track_features"] == "dummy"
-
-    assert "hotfix_depends_test-1.0-dummy_0.tar.bz2" in pkg_list
-    assert pkg_list["hotfix_depends_test-1.0-dummy_0.tar.bz2"]["features"] == "dummy"
-    assert "zlib" in pkg_list["hotfix_depends_test-1.0-dummy_0.tar.bz2"]["depends"]
-
-    assert "revoke_test-1.0-0.tar.bz2" in pkg_list
-    assert "zlib" in pkg_list["revoke_test-1.0-0.tar.bz2"]["depends"]
-    assert (
-        "package_has_been_revoked"
-        not in pkg_list["revoke_test-1.0-0.tar.bz2"]["depends"]
-    )
-
-    assert "remove_test-1.0-0.tar.bz2" in pkg_list
-
-
 def test_index_of_removed_pkg(testing_metadata):
     archive_name = "test_index_of_removed_pkg-1.0-1.tar.bz2"
     archive_destination = os.path.join(
@@ -726,10 +623,9 @@ def test_index_of_removed_pkg(testing_metadata):
     conda_index.api.update_index(testing_metadata.config.croot)
 
     # repodata.json should exist here
-    with open(
+    repodata = load_json(
         os.path.join(testing_metadata.config.croot, TEST_SUBDIR, "repodata.json")
-    ) as f:
-        repodata = json.load(f)
+    )
     assert repodata["packages"]
 
     for f in [archive_destination]:
@@ -737,17 +633,15 @@ def test_index_of_removed_pkg(testing_metadata):
 
     # repodata.json should be empty here
     conda_index.api.update_index(testing_metadata.config.croot)
-    with open(
+    repodata = load_json(
         os.path.join(testing_metadata.config.croot, TEST_SUBDIR, "repodata.json")
-    ) as f:
-        repodata = json.load(f)
+    )
     assert not repodata["packages"]
-    with open(
+    repodata = load_json(
         os.path.join(
             testing_metadata.config.croot, TEST_SUBDIR, "repodata_from_packages.json"
         )
-    ) as f:
-        repodata = json.load(f)
+    )
     assert not repodata["packages"]
 
 
@@ -862,8 +756,7 @@ def test_new_pkg_format_preferred(testing_workdir, mocker):
     cph_extract.assert_any_call(test_package_path + ".conda")
     cph_extract.assert_any_call(test_package_path + ".tar.bz2")
 
-    with open(join(testing_workdir, "osx-64", "repodata.json")) as fh:
-        actual_repodata_json = json.loads(fh.read())
+    actual_repodata_json = load_json(join(testing_workdir, "osx-64", "repodata.json"))
 
     expected_repodata_json = {
         "info": {
@@ -914,8 +807,7 @@ def test_new_pkg_format_preferred(testing_workdir, mocker):
         testing_workdir, channel_name="test-channel", verbose=True, debug=True
     )
 
-    with open(join(testing_workdir, "osx-64", "repodata.json")) as fh:
-        actual_repodata_json = json.loads(fh.read())
+    actual_repodata_json = load_json(join(testing_workdir, "osx-64", "repodata.json"))
 
     assert actual_repodata_json == expected_repodata_json
 
@@ -958,8 +850,7 @@ def test_new_pkg_format_stat_cache_used(testing_workdir, mocker):
     )
     cph_extract.assert_not_called()
 
-    with open(join(testing_workdir, "osx-64", "repodata.json")) as fh:
-        actual_repodata_json = json.loads(fh.read())
+    actual_repodata_json = load_json(join(testing_workdir, "osx-64", "repodata.json"))
 
     expected_repodata_json = {
         "info": {
@@ -1007,8 +898,7 @@ def test_new_pkg_format_stat_cache_used(testing_workdir, mocker):
 )
 def test_current_index_reduces_space(index_data):
     repodata = Path(index_data, "time_cut", "repodata.json")
-    with open(repodata) as f:
-        repodata = json.load(f)
+    repodata = load_json(repodata)
     assert len(repodata["packages"]) == 7
     assert len(repodata["packages.conda"]) == 3
     trimmed_repodata = conda_index.index._build_current_repodata(
@@ -1048,8 +938,7 @@ def test_current_index_version_keys_keep_older_packages(index_data):
 
     # pass no version file
     conda_index.api.update_index(pkg_dir)
-    with open(os.path.join(pkg_dir, "osx-64", "current_repodata.json")) as f:
-        repodata = json.load(f)
+    repodata = load_json(os.path.join(pkg_dir, "osx-64", "current_repodata.json"))
     # only the newest version is kept
     assert len(repodata["packages"]) == 1
     assert list(repodata["packages"].values())[0]["version"] == "2.0"
@@ -1058,24 +947,21 @@ def test_current_index_version_keys_keep_older_packages(index_data):
     conda_index.api.update_index(
         pkg_dir, current_index_versions=os.path.join(pkg_dir, "versions.yml")
     )
-    with open(os.path.join(pkg_dir, "osx-64", "current_repodata.json")) as f:
-        repodata = json.load(f)
+    repodata = load_json(os.path.join(pkg_dir, "osx-64", "current_repodata.json"))
     assert len(repodata["packages"]) == 2
 
     # pass dict that is equivalent to version file
     conda_index.api.update_index(
         pkg_dir, current_index_versions={"dummy-package": ["1.0"]}
     )
-    with open(os.path.join(pkg_dir, "osx-64", "current_repodata.json")) as f:
-        repodata = json.load(f)
+    repodata = load_json(os.path.join(pkg_dir, "osx-64", "current_repodata.json"))
     assert list(repodata["packages"].values())[0]["version"] == "1.0"
 
 
 def test_channeldata_picks_up_all_versions_of_run_exports(index_data):
     pkg_dir = os.path.join(index_data, "packages")
     conda_index.api.update_index(pkg_dir)
-    with open(os.path.join(pkg_dir, "channeldata.json")) as f:
-        repodata = json.load(f)
+    repodata = load_json(os.path.join(pkg_dir, "channeldata.json"))
     run_exports = repodata["packages"]["run_exports_versions"]["run_exports"]
     assert len(run_exports) == 2
     assert "1.0" in run_exports
@@ -1085,8 +971,7 @@ def test_channeldata_picks_up_all_versions_of_run_exports(index_data):
 def test_index_invalid_packages(index_data):
     pkg_dir = os.path.join(index_data, "corrupt")
     conda_index.api.update_index(pkg_dir)
-    with open(os.path.join(pkg_dir, "channeldata.json")) as f:
-        repodata = json.load(f)
+    repodata = load_json(os.path.join(pkg_dir, "channeldata.json"))
     assert len(repodata["packages"]) == 0
 
 
@@ -1141,8 +1026,7 @@ def test_run_exports(index_data):
 
     noarch_run_exports_path = os.path.join(pkg_dir, "noarch", "run_exports.json")
     assert os.path.isfile(noarch_run_exports_path)
-    with open(noarch_run_exports_path) as f:
-        noarch_data = json.load(f)
+    noarch_data = load_json(noarch_run_exports_path)
 
     # Test data defines two packages with run_exports in noarch
     assert noarch_data["info"]["subdir"] == "noarch"
@@ -1167,8 +1051,7 @@ def test_run_exports(index_data):
     # with an empty run_exports dict
     osx64_run_exports_path = os.path.join(pkg_dir, "osx-64", "run_exports.json")
     assert os.path.isfile(osx64_run_exports_path)
-    with open(osx64_run_exports_path) as f:
-        osx64_data = json.load(f)
+    osx64_data = load_json(osx64_run_exports_path)
 
     assert osx64_data["info"]["subdir"] == "osx-64"
     assert osx64_data["info"]["version"] == 1
@@ -1325,8 +1208,8 @@ def test_base_url(index_data):
 
     channel_index.index(None)
 
-    osx = json.loads((pkg_dir / "osx-64" / "repodata.json").read_text())
-    noarch = json.loads((pkg_dir / "noarch" / "repodata.json").read_text())
+    osx = load_json(pkg_dir / "osx-64" / "repodata.json")
+    noarch = load_json(pkg_dir / "noarch" / "repodata.json")
 
     assert osx["repodata_version"] == 2
 
@@ -1362,3 +1245,36 @@ def test_write_current_repodata(index_data):
     channel_index.index(None)
 
     assert not list(pkg_dir.glob(pattern))
+
+
+def test_trust_cache(index_data):
+    """
+    With trust_cache, changes to the channel after the first run are not noticed.
+    """
+    pkg_dir = Path(index_data, "packages")
+
+    channel_index = conda_index.index.ChannelIndex(
+        pkg_dir,
+        None,
+        write_bz2=False,
+        write_zst=False,
+        threads=1,
+        trust_cache=True,
+    )
+
+    # brand new cache is always scanned
+    channel_index.index(None)
+
+    repodata_path = pkg_dir / "osx-64" / "repodata.json"
+    repodata = load_json(repodata_path)
+    assert "dummy-package-2.0-0.tar.bz2" in repodata["packages"]
+
+    (pkg_dir / "osx-64" / "dummy-package-2.0-0.tar.bz2").unlink()
+
+    channel_index.index(None)
+    assert load_json(repodata_path) == repodata
+
+    channel_index.trust_cache = False
+    channel_index.index(None)
+    repodata = load_json(repodata_path)
+    assert "dummy-package-2.0-0.tar.bz2" not in repodata["packages"]
@@ -3,6 +3,7 @@ Test sqlitecache
 """
 
 import json
+import shutil
 import sqlite3
 import tarfile
 from io import BytesIO
@@ -27,6 +28,17 @@ from conda_index.index.sqlitecache import (
 from conda_index.utils import DEFAULT_SUBDIRS
 
 
+def connect_scratch(path):
+    """
+    connect() for throwaway test databases: keep the journal in memory and
+    skip fsync.
+    """
+    conn = connect(str(path))
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    conn.execute("PRAGMA synchronous = OFF")
+    return conn
+
+
 def test_cache_extract_without_stat_result(index_data):
     """
     Exercise CondaIndexCache.
@@ -56,7 +68,7 @@ def test_cache_unusual_files(tmp_path):
     (tmp_path / "noarch").mkdir()
     tar = tmp_path / "noarch" / "devicefile.tar.bz2"
 
-    with tarfile.open(tar, mode="w:bz2") as t:
+    with tarfile.open(tar, mode="w:bz2", compresslevel=1) as t:
         # icon file, though empty, to trigger cache-icon code. Before index.json
         # which doesn't mention icons.
         icon = tarfile.TarInfo(name="info/icon.png")
@@ -96,7 +108,7 @@ def test_cache_source_as_list(tmp_path):
     (tmp_path / "noarch").mkdir()
     tar = tmp_path / "noarch" / "source-as-list.tar.bz2"
 
-    with tarfile.open(tar, mode="w:bz2") as t:
+    with tarfile.open(tar, mode="w:bz2", compresslevel=1) as t:
         # index.json required to finish cache function
         index = tarfile.TarInfo(name="info/index.json")
         index_data = b'{"source":["a", "b"]}'
@@ -118,6 +130,31 @@ def test_cache_source_as_list(tmp_path):
     assert found["mtime"] > 0
 
 
+def test_changed_packages_null_mtime(tmp_path):
+    """
+    fsspec may not report an mtime. A NULL mtime only matches another NULL.
+    """
+    (tmp_path / "noarch").mkdir()
+    cache = CondaIndexCache(tmp_path, "noarch")
+
+    rows = {
+        # (fs mtime, indexed mtime)
+        "null-both-1.0-0.conda": (None, None),
+        "null-fs-1.0-0.conda": (None, 1.0),
+        "unchanged-1.0-0.conda": (1.0, 1.0),
+    }
+    with cache.db:
+        for fn, (fs_mtime, indexed_mtime) in rows.items():
+            for stage, mtime in (("fs", fs_mtime), ("indexed", indexed_mtime)):
+                cache.db.execute(
+                    "INSERT INTO stat (stage, path, mtime, size) VALUES (?, ?, ?, 42)",
+                    (stage, cache.database_path(fn), mtime),
+                )
+
+    changed = {cache.plain_path(row["path"]) for row in cache.changed_packages()}
+    assert changed == {"null-fs-1.0-0.conda"}
+
+
 def test_convert_legacy_cache(tmp_path):
     """
     conda-index will automatically convert a many-small-files cache to a
@@ -125,7 +162,7 @@ def test_convert_legacy_cache(tmp_path):
     """
     legacy_cache = Path(__file__).parent / "index_data" / "legacy_cache" / ".cache"
     new_database = tmp_path / "converted.db"
-    conn = connect(new_database)
+    conn = connect_scratch(new_database)
     with conn:
         create(conn)
         migrate(conn)
@@ -138,6 +175,12 @@ def test_merge_index_cache(tmp_path):
     Merge multiple caches into one for data mining. Not used by normal index
     process.
     """
+    # run the schema DDL once, then copy the empty database into each subdir
+    template_db = tmp_path / "template.db"
+    with connect_scratch(template_db) as conn:
+        create(conn)
+    conn.close()
+
     for subdir in DEFAULT_SUBDIRS:
         db_path = tmp_path / subdir / ".cache" / "cache.db"
         db_path.parent.mkdir(parents=True)
@@ -145,23 +188,27 @@ def test_merge_index_cache(tmp_path):
             # exclude a couple to improve code coverage
             continue
 
-        with connect(db_path) as conn:
-            create(conn)
+        shutil.copyfile(template_db, db_path)
+        with connect_scratch(db_path) as conn:
             # / here triggers code coverage in migrate function
             conn.execute(
                 f"INSERT INTO index_json (path, index_json) VALUES ('prefix/{subdir}.conda', '{{}}')"
             )
             migrate(conn)
 
-    merge_index_cache(tmp_path)
+    merged_db = tmp_path / "merged.db"
+    merge_index_cache(tmp_path, output_db=str(merged_db))
 
     seen_subdirs = set()
-    with connect("merged.db") as conn:
+    with connect(merged_db) as conn:
         for row in conn.execute("SELECT path FROM index_json"):
             channel, subdir, _ = row[0].split("/")
             assert channel == tmp_path.name
             seen_subdirs.add(subdir)
 
+    # on failure, pytest lists the missing or unexpected subdirs by name
+    assert seen_subdirs == {subdir for subdir in DEFAULT_SUBDIRS if "-32" not in subdir}
+
 
 def test_description_as_list():
     """
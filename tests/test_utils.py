@@ -1,31 +1,27 @@
-import pathlib
-import tempfile
-
 from conda_index.index.convert_cache import ichunked
 from conda_index.utils import file_contents_match
 
 
-def test_file_contents_match():
+def test_file_contents_match(tmp_path):
     """
     Assert file_contents_match works correctly with different and same length
     files, and files with different and same filenames. To allow for compare
     size optimization.
     """
-    with tempfile.TemporaryDirectory() as directory:
-        a = pathlib.Path(directory, "a.txt")
-        a.write_text("matching length A")
-        b = pathlib.Path(directory, "b.txt")
-        b.write_text("matching length B")
-        c = pathlib.Path(directory, "c.txt")
-        c.write_text("different length")
-        d = pathlib.Path(directory, "d.txt")
-        d.write_text("different length")
+    a = tmp_path / "a.txt"
+    a.write_bytes(b"matching length A")
+    b = tmp_path / "b.txt"
+    b.write_bytes(b"matching length B")
+    c = tmp_path / "c.txt"
+    c.write_bytes(b"different length")
+    d = tmp_path / "d.txt"
+    d.write_bytes(b"different length")
 
-        assert not file_contents_match(a, b)
-        assert not file_contents_match(a, c)
+    assert not file_contents_match(a, b)
+    assert not file_contents_match(a, c)
 
-        assert file_contents_match(c, c)
-        assert file_contents_match(c, d)
+    assert file_contents_match(c, c)
+    assert file_contents_match(c, d)
 
 
 def test_ichunked():
@@ -50,15 +46,11 @@ def test_ichunked():
             generated = i
             yield i, counter
 
-    print("More lazy version")
     for chunk in ichunked(counters(), CHUNK_SIZE):
-        print("Batch")
         chunk_size = 0
         for i, c in chunk:
             chunk_size += 1
-            count = c()
-            print(i, generated, count)
-            assert i == generated == count
+            assert i == generated == c()
         assert chunk_size == CHUNK_SIZE or chunk_size == REMAINDER
 
     try:
@@ -68,9 +60,7 @@ def test_ichunked():
 
     # demonstrate that generated is sometimes greater than i, c() in
     # gathers-into-tuples implementation
-    print("Less lazy version")
     consumed = -1
     for chunk in batched(counters(), CHUNK_SIZE):
-        print("Batch")
         for i, c in chunk:
-            print(i, generated, c())
+            assert generated >= i == c()